@@ -0,0 +1 @@
+# OKX volume profiles package
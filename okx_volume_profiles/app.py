@@ -7,12 +7,15 @@
     - Анализ доминации объемов BTC vs ETH
     - Автоматическая очистка старых данных
     - Корректное завершение при нажатии Ctrl+C
+
+    Запуск (из корня репозитория):
+        python -m okx_volume_profiles.app
 """
 
 # импорт модулей Python
 import asyncio
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, Patch
 import plotly.graph_objs as go
 import json
 import time
@@ -20,78 +23,493 @@ import os
 import glob
 import signal
 import atexit
-from datetime import datetime, timedelta
 import threading
+import shutil
 import sys
+import functools
 from pathlib import Path
-from collections import deque
+from typing import List, Optional
+from dataclasses import dataclass
+import numpy as np
+import msgspec
+
+try:
+    # быстрый event loop на базе libuv (недоступен на Windows)
+    import uvloop
+except ImportError:
+    uvloop = None
+
+from okx_volume_profiles.src.api.okx_client import OKXWebSocketClient, OKXMessage
+from okx_volume_profiles.src.data.data_manager import DataManager
+from okx_volume_profiles.src.perf.binning import vol_profile
+
+
+@dataclass
+class SymbolSnapshot:
+    """
+        SymbolSnapshot - снимок данных одного инструмента для отрисовки дашборда
+    """
+    count: int                      # количество сделок в буфере
+    last_price: Optional[float]     # цена последней сделки
+    volume_50: float                # объем последних 50 сделок
+    volume_100: float               # объем последних 100 сделок
+    profile_levels: list            # центры непустых ценовых уровней volume profile
+    profile_volumes: list           # объемы на этих уровнях
+    profile_count: int              # количество сделок в окне volume profile
+
+
+@dataclass
+class MarketSnapshot:
+    """
+        MarketSnapshot - снимок данных всех инструментов, снимается один раз за тик интерфейса
+    """
+    btc: SymbolSnapshot
+    eth: SymbolSnapshot
+
+
+class TradeRing:
+    """
+        TradeRing - кольцевой буфер сделок одного инструмента в колоночном виде (SoA).
+        Цены, объемы и время сделок хранятся в заранее выделенных массивах NumPy
+
+        Буфер рассчитан на одного писателя (поток сборщика) и любое количество читателей
+        (callback-и Dash) и работает без блокировок: писатель сначала заполняет слот,
+        а затем последней операцией публикует новое значение счетчика written.
+        Читатель один раз считывает written и копирует только уже опубликованные слоты
+
+        Дополнительно буфер поддерживает volume profile последних profile_window сделок:
+        объемы по profile_bins ценовым уровням обновляются инкрементально при каждой записи
+        (новая сделка добавляется, вышедшая из окна - вычитается). Сетка строится с запасом
+        в profile_pad уровней ниже и выше диапазона цен окна и перестраивается заново,
+        если цена вышла и за запас, а также раз в profile_window сделок
+
+        Для окон sum_windows (по умолчанию последние 50 и 100 сделок) так же поддерживаются
+        скользящие суммы объемов: volume_sum() для этих окон не обращается к массивам вовсе
+    """
+
+    def __init__(self, size: int = 1000, profile_window: int = 200, profile_bins: int = 20,
+                 sum_windows: tuple = (50, 100), profile_pad: int = 5):
+        self.size = size
+        self.profile_window = profile_window
+        self.profile_bins = profile_bins
+        self.profile_pad = profile_pad
+
+        self.price = np.empty(size, dtype=np.float64)
+        self.volume = np.empty(size, dtype=np.float64)
+        self.ts = np.empty(size, dtype=np.int64)
+
+        # общее количество записанных сделок (монотонно растет, публикуется последним)
+        self.written = 0
+
+        # volume profile окна: (нижняя граница сетки, шаг уровня, объемы по уровням)
+        self._profile = None
+
+        # скользящие суммы объемов: размер окна -> сумма объемов последних сделок
+        self._window_sums = {window: 0.0 for window in sum_windows}
+
+    @property
+    def count(self) -> int:
+        # количество сделок, доступных в буфере
+        return min(self.written, self.size)
+
+    def append(self, price: float, volume: float, ts: int):
+        """
+            append() - запись сделки в очередной слот буфера (самая старая сделка перезаписывается)
+        """
+        written = self.written
+        i = written % self.size
+        self.price[i] = price
+        self.volume[i] = volume
+        self.ts[i] = ts
+
+        # публикация слота для читателей
+        self.written = written + 1
+
+        self._update_sums(written + 1, volume)
+        self._update_profile(written + 1, price, volume)
+
+    def last_price(self) -> float:
+        """
+            last_price() - цена последней сделки (None, если сделок еще не было)
+        """
+        end = self.written
+        if end == 0:
+            return None
+        return float(self.price[(end - 1) % self.size])
+
+    def volume_sum(self, limit: int) -> float:
+        """
+            volume_sum() - суммарный объем последних limit сделок без копирования массивов
+            (для окон из sum_windows - готовая скользящая сумма)
+        """
+        window_sum = self._window_sums.get(limit)
+        if window_sum is not None:
+            return window_sum
+        return self._slice_volume_sum(limit)
+
+    def _slice_volume_sum(self, limit: int) -> float:
+        """
+            _slice_volume_sum() - суммарный объем последних limit сделок по срезам массива объемов
+        """
+        end = self.written
+        n = min(limit, end, self.size)
+        head = end % self.size
+        start = head - n
+
+        if start >= 0:
+            return float(self.volume[start:head].sum())
+        return float(self.volume[start:].sum() + self.volume[:head].sum())
+
+    def _update_sums(self, end: int, volume: float):
+        """
+            _update_sums() - обновление скользящих сумм после записи сделки.
+            end - значение счетчика written после записи
+        """
+        if end % self.size == 0:
+            # раз в оборот кольца пересчитываем суммы точно (сбрасываем накопленную погрешность)
+            self._resync_sums()
+            return
+
+        sums = self._window_sums
+        for window in sums:
+            # сделка, вышедшая из окна, еще лежит в кольце (size > window)
+            old = float(self.volume[(end - 1 - window) % self.size]) if end > window else 0.0
+            sums[window] += volume - old
+
+    def _update_sums_batch(self, begin: int, end: int, volumes: np.ndarray):
+        """
+            _update_sums_batch() - обновление скользящих сумм после записи пачки сделок с номерами [begin, end)
+        """
+        sums = self._window_sums
+        if not sums:
+            return
+        if begin // self.size != end // self.size or end - begin > self.size - max(sums):
+            # оборот кольца или вышедшие из окна сделки уже перезаписаны - точный пересчет
+            self._resync_sums()
+            return
+
+        added = float(volumes.sum())
+        for window in sums:
+            lo = max(begin - window, 0)
+            hi = max(end - window, 0)
+            evicted = float(self.volume[np.arange(lo, hi) % self.size].sum()) if hi > lo else 0.0
+            sums[window] += added - evicted
+
+    def _resync_sums(self):
+        """
+            _resync_sums() - точный пересчет скользящих сумм по массиву объемов
+        """
+        for window in self._window_sums:
+            self._window_sums[window] = self._slice_volume_sum(window)
+
+    def extend(self, prices: np.ndarray, volumes: np.ndarray, ts: np.ndarray):
+        """
+            extend() - запись пачки сделок (в хронологическом порядке) двумя срезами вместо поэлементной записи
+        """
+        k = len(prices)
+        if k == 0:
+            return
+
+        written = self.written
+        if k > self.size:
+            # в кольцо помещаются только последние size сделок
+            skip = k - self.size
+            written += skip
+            prices, volumes, ts = prices[skip:], volumes[skip:], ts[skip:]
+            k = self.size
+
+        start = written % self.size
+        first = min(k, self.size - start)
+        rest = k - first
 
-sys.path.append(str(Path(__file__).parent / "src"))
+        self.price[start:start + first] = prices[:first]
+        self.volume[start:start + first] = volumes[:first]
+        self.ts[start:start + first] = ts[:first]
+        if rest:
+            self.price[:rest] = prices[first:]
+            self.volume[:rest] = volumes[first:]
+            self.ts[:rest] = ts[first:]
 
-from api.okx_client import OKXWebSocketClient
-from data.data_manager import DataManager
+        # публикация слотов для читателей
+        self.written = written + k
+
+        self._update_sums_batch(written, written + k, volumes)
+        self._update_profile_batch(written, written + k, prices, volumes)
+
+    def _update_profile_batch(self, begin: int, end: int, prices: np.ndarray, volumes: np.ndarray):
+        """
+            _update_profile_batch() - инкрементальное обновление volume profile после записи пачки сделок
+            с номерами [begin, end)
+        """
+        window = self.profile_window
+        profile = self._profile
+
+        # те же условия перестройки, что и для одной сделки; дополнительно - если пачка
+        # настолько велика, что вышедшие из окна сделки уже перезаписаны в кольце
+        if (profile is None or end <= window or begin // window != end // window
+                or end - begin > self.size - window):
+            self._rebin_profile()
+            return
+
+        min_price, bin_size, bin_volumes = profile
+        bins = len(bin_volumes)
+        if prices.min() < min_price or prices.max() > min_price + bins * bin_size:
+            self._rebin_profile()
+            return
+
+        new_bins = np.clip(((prices - min_price) / bin_size).astype(np.int64), 0, bins - 1)
+        np.add.at(bin_volumes, new_bins, volumes)
+
+        old = np.arange(begin - window, end - window) % self.size
+        old_bins = np.clip(((self.price[old] - min_price) / bin_size).astype(np.int64), 0, bins - 1)
+        np.subtract.at(bin_volumes, old_bins, self.volume[old])
+
+    def _update_profile(self, end: int, price: float, volume: float):
+        """
+            _update_profile() - инкрементальное обновление volume profile после записи сделки.
+            end - значение счетчика written после записи
+        """
+        window = self.profile_window
+        profile = self._profile
+
+        # сетка еще не построена, окно не заполнено, окно полностью обновилось
+        # или цена вышла за границы сетки (вместе с запасом) - перестраиваем профиль по всему окну
+        if profile is None or end <= window or end % window == 0:
+            self._rebin_profile()
+            return
+
+        min_price, bin_size, bin_volumes = profile
+        bins = len(bin_volumes)
+        if not min_price <= price <= min_price + bins * bin_size:
+            self._rebin_profile()
+            return
+
+        bin_volumes[min(int((price - min_price) / bin_size), bins - 1)] += volume
+
+        # сделка, вышедшая из окна, еще лежит в кольце (size > profile_window)
+        old = (end - 1 - window) % self.size
+        old_bin = min(max(int((self.price[old] - min_price) / bin_size), 0), bins - 1)
+        bin_volumes[old_bin] -= self.volume[old]
+
+    def _rebin_profile(self):
+        """
+            _rebin_profile() - построение сетки уровней и volume profile заново по последним profile_window сделкам
+        """
+        prices, volumes, _ = self.last(self.profile_window)
+        # кортеж заменяется целиком, поэтому читатель всегда видит согласованную сетку
+        self._profile = vol_profile(prices, volumes, self.profile_bins, self.profile_pad)
+
+    def volume_profile(self):
+        """
+            volume_profile() - текущий volume profile окна
+
+            Returns:
+                (levels, volumes, count): списки центров непустых ценовых уровней (по возрастанию),
+                объемов на них и количество сделок в окне
+        """
+        profile = self._profile
+        count = min(self.written, self.profile_window)
+        if profile is None:
+            return [], [], count
+
+        min_price, bin_size, bin_volumes = profile
+        bin_volumes = bin_volumes.copy()
+        levels = min_price + (np.arange(len(bin_volumes)) + 0.5) * bin_size
+
+        # пустые уровни на графике не показываем (порог отсекает остаток от вычитаний)
+        filled = bin_volumes > 1e-12
+        return levels[filled].tolist(), bin_volumes[filled].tolist(), count
+
+    def snapshot(self) -> SymbolSnapshot:
+        """
+            snapshot() - снимок данных буфера для отрисовки дашборда
+        """
+        levels, volumes, profile_count = self.volume_profile()
+        return SymbolSnapshot(
+            count=self.count,
+            last_price=self.last_price(),
+            volume_50=self.volume_sum(50),
+            volume_100=self.volume_sum(100),
+            profile_levels=levels,
+            profile_volumes=volumes,
+            profile_count=profile_count
+        )
+
+    def last(self, limit: int):
+        """
+            last() - копии последних limit значений (price, volume, ts) в хронологическом порядке
+        """
+        # снимок счетчика: дальше работаем только с опубликованными слотами
+        end = self.written
+        n = min(limit, end, self.size)
+        head = end % self.size
+        start = head - n
+
+        if start >= 0:
+            return (self.price[start:head].copy(),
+                    self.volume[start:head].copy(),
+                    self.ts[start:head].copy())
+
+        # окно переходит через конец массива - склеиваем два куска
+        return (np.concatenate((self.price[start:], self.price[:head])),
+                np.concatenate((self.volume[start:], self.volume[:head])),
+                np.concatenate((self.ts[start:], self.ts[:head])))
 
 
 class DataBuffer:
     """
         DataBuffer - менеджер данных сделок (BTC, ETH) в реальном времени.
-        Сделки хранятся в деках, длиной 1000
+        Сделки хранятся в кольцевых буферах TradeRing, длиной 1000
     """
     
     def __init__(self):
-        self.btc_trades = deque(maxlen=1000)
-        self.eth_trades = deque(maxlen=1000)
+        self.btc = TradeRing(1000, profile_window=200, profile_bins=20)
+        self.eth = TradeRing(1000, profile_window=200, profile_bins=20)
+        
+        # буферы по символу инструмента
+        self.rings = {'BTC': self.btc, 'ETH': self.eth}
         
-        # аттрибут для блокировки 
-        self.lock = threading.Lock()
+        # буферы по номеру символа (BTC - 0, ETH - 1) и кэш instId -> номер символа
+        self.rings_by_id = (self.btc, self.eth)
+        self._symbol_ids = {}
         
         self.add_count = 0
+
+        # кэш форматированной текущей секунды для log()
+        self._log_sec = -1
+        self._log_prefix = ''
         
     def log(self, message: str):
-        # логируем сообщение по времени
-        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        print(f"[{timestamp}] {message}")
+        # логируем сообщение по времени (strftime - только при смене секунды)
+        t = time.time()
+        sec = int(t)
+        if sec != self._log_sec:
+            self._log_sec = sec
+            self._log_prefix = time.strftime('%H:%M:%S', time.localtime(sec))
+        print(f"[{self._log_prefix}.{int((t - sec) * 1000):03d}] {message}")
+    
+    def symbol_id(self, inst_id: str) -> int:
+        """
+            symbol_id() - номер символа инструмента: 0 - BTC, 1 - ETH, -1 - не отслеживается.
+            Разбор строки instId выполняется один раз на инструмент, дальше - из кэша
+        """
+        sym_id = self._symbol_ids.get(inst_id)
+        if sym_id is None:
+            upper = inst_id.upper()
+            if 'BTC' in upper:
+                sym_id = 0
+            elif 'ETH' in upper:
+                sym_id = 1
+            else:
+                sym_id = -1
+            self._symbol_ids[inst_id] = sym_id
+        return sym_id
     
     def add_trade(self, inst_id: str, trade_data: dict):
         """
-            add_trade() - добавление сделки в соответствующую очередь с логированием.
+            add_trade() - добавление сделки в соответствующий буфер с логированием.
             
             Args:
                 inst_id (str):      инентификатор инструмента (например, 'BTC-USDT')
                 trade_data (dict):  данные о сделке (цена, объем, время и т.д.)
         """
+        self.add_trade_by_id(self.symbol_id(inst_id), trade_data)
+    
+    def add_trade_by_id(self, sym_id: int, trade_data: dict):
+        """
+            add_trade_by_id() - добавление сделки в буфер по номеру символа (см. symbol_id())
+        """
         self.add_count += 1
         
-        with self.lock:
-            if 'BTC' in inst_id.upper():
-                self.btc_trades.append(trade_data)
-                
-                # if self.add_count % 10 == 0:
-                #     self.log(f"*** BTC сделок: {len(self.btc_trades)}")
-            elif 'ETH' in inst_id.upper():
-                self.eth_trades.append(trade_data)
-                
-                # if self.add_count % 10 == 0:
-                #     self.log(f"*** ETH сделок: {len(self.eth_trades)}")
+        if sym_id == 0:
+            self.btc.append(trade_data['price'], trade_data['volume'], trade_data['timestamp'])
+            
+            # if self.add_count % 10 == 0:
+            #     self.log(f"*** BTC сделок: {self.btc.count}")
+        elif sym_id == 1:
+            self.eth.append(trade_data['price'], trade_data['volume'], trade_data['timestamp'])
+            
+            # if self.add_count % 10 == 0:
+            #     self.log(f"*** ETH сделок: {self.eth.count}")
+    
+    def add_trades_batch(self, inst_id: str, prices: np.ndarray, volumes: np.ndarray, ts: np.ndarray):
+        """
+            add_trades_batch() - добавление пачки сделок одного инструмента в соответствующий буфер.
+            
+            Args:
+                inst_id (str):          инентификатор инструмента (например, 'BTC-USDT')
+                prices (np.ndarray):    цены сделок
+                volumes (np.ndarray):   объемы сделок
+                ts (np.ndarray):        время сделок (Unix timestamp, мс)
+        """
+        self.add_trades_batch_by_id(self.symbol_id(inst_id), prices, volumes, ts)
+    
+    def add_trades_batch_by_id(self, sym_id: int, prices: np.ndarray, volumes: np.ndarray, ts: np.ndarray):
+        """
+            add_trades_batch_by_id() - добавление пачки сделок в буфер по номеру символа (см. symbol_id())
+        """
+        self.add_count += len(prices)
+        
+        if sym_id >= 0:
+            self.rings_by_id[sym_id].extend(prices, volumes, ts)
     
-    def get_btc_trades(self, limit=100):
+    def snapshot(self) -> MarketSnapshot:
         """
-            Геттер для последних limit сделок BTC
+            Снимок данных BTC и ETH для одного обновления интерфейса
         """
-        with self.lock:
-            return list(self.btc_trades)[-limit:]
+        return MarketSnapshot(btc=self.btc.snapshot(), eth=self.eth.snapshot())
     
-    def get_eth_trades(self, limit=100):
+    def last_price(self, symbol: str) -> float:
         """
-            Геттер для последних limit сделок ETH
+            Цена последней сделки по символу ('BTC' или 'ETH')
         """
-        with self.lock:
-            return list(self.eth_trades)[-limit:]
+        return self.rings[symbol].last_price()
+    
+    def last_volume_sum(self, symbol: str, limit: int) -> float:
+        """
+            Суммарный объем последних limit сделок по символу ('BTC' или 'ETH')
+        """
+        return self.rings[symbol].volume_sum(limit)
+    
+    def get_btc_arrays(self, limit=100):
+        """
+            Геттер для последних limit сделок BTC в виде массивов (price, volume, ts)
+        """
+        return self.btc.last(limit)
+    
+    def get_btc_profile(self):
+        """
+            Геттер для volume profile последних 200 сделок BTC: (levels, volumes, count)
+        """
+        return self.btc.volume_profile()
+    
+    def get_eth_arrays(self, limit=100):
+        """
+            Геттер для последних limit сделок ETH в виде массивов (price, volume, ts)
+        """
+        return self.eth.last(limit)
+    
+    def get_eth_profile(self):
+        """
+            Геттер для volume profile последних 200 сделок ETH: (levels, volumes, count)
+        """
+        return self.eth.volume_profile()
 
-####### GLOBAL VARIABLES #######
 
-# создаем менеджер глобально
-data = DataBuffer()
+def _annotation(text: str) -> dict:
+    """
+        _annotation() - параметры надписи по центру графика (нет данных, ошибка)
+    """
+    return dict(text=text, xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
+
+@functools.lru_cache(maxsize=None)
+def get_buffer() -> DataBuffer:
+    """
+        get_buffer() - общий буфер данных сделок, создается при первом обращении
+    """
+    return DataBuffer()
+
+####### GLOBAL VARIABLES #######
 
 # создаем глобальную ссылку на дэшборд (для корректного завершения)
 dashboard_instance = None
@@ -143,17 +561,21 @@ class Dashboard:
         Логика:
             - веб-интерфейс работает в основном потоке
             - Сборщик данных работает в отдельном потоке
-            - данные передаются через глобальную переменную data
+            - данные передаются через общий буфер get_buffer() (self.data)
             - автообновление интерфейса каждые 3 секунды
     """
     
     def __init__(self):
         self.app = dash.Dash(__name__)
         
+        # буфер данных сделок в реальном времени
+        self.data = get_buffer()
+        
         # менеджер для сохранения данных в файлы
         self.data_manager = DataManager()
         
         # настройка интерфейса и обработчиков
+        self.setup_figures()
         self.setup_layout()
         self.setup_callbacks()
         
@@ -176,23 +598,15 @@ class Dashboard:
             
             deleted_count = 0
             
-            trades_dir = data_dir / "trades"
-            if trades_dir.exists():
-                for file_path in trades_dir.glob("*.jsonl"):
-                    file_path.unlink()
-                    deleted_count += 1
-            
-            books_dir = data_dir / "books"
-            if books_dir.exists():
-                for file_path in books_dir.glob("*.jsonl"):
-                    file_path.unlink()
-                    deleted_count += 1
-            
-            other_dir = data_dir / "other"
-            if other_dir.exists():
-                for file_path in other_dir.glob("*.jsonl"):
-                    file_path.unlink()
-                    deleted_count += 1
+            # каталоги сырых данных (папки каналов DataManager и other) удаляются целиком и создаются заново
+            for sub in (*DataManager.CHANNEL_DIRS.values(), "other"):
+                sub_dir = data_dir / sub
+                if not sub_dir.exists():
+                    continue
+                with os.scandir(sub_dir) as entries:
+                    deleted_count += sum(1 for entry in entries if entry.is_file())
+                shutil.rmtree(sub_dir, ignore_errors=True)
+                sub_dir.mkdir(parents=True, exist_ok=True)
             
             if deleted_count > 0:
                 print(f"Очищено {deleted_count} файлов данных")
@@ -203,6 +617,55 @@ class Dashboard:
             print(f"Ошибка очистки данных: {e}")
         
 
+    def setup_figures(self):
+        """
+            setup_figures() - однократное построение графиков (трассы, оси, подписи) для макета.
+            Графики создаются один раз и дальше не пересоздаются: callback отправляет
+            в браузер только изменившиеся свойства (dash.Patch)
+        """
+        self._btc_fig = self._profile_figure('BTC', 'rgba(247, 147, 26, 0.7)')  # Оранжевый цвет BTC
+        self._eth_fig = self._profile_figure('ETH', 'rgba(98, 126, 234, 0.7)')  # Синий цвет ETH
+        
+        # круговая диаграмма доминации (пока без данных - равное распределение)
+        self._dom_fig = go.Figure(data=[
+            go.Pie(
+                labels=['BTC', 'ETH'],
+                values=[50, 50],
+                hole=0.3,  # Дырка в центре для современного вида
+                marker_colors=['#f7931a', '#627eea']  # Цвета BTC и ETH
+            )
+        ])
+        self._dom_fig.update_layout(
+            title="Доминация BTC vs ETH<br>BTC: 50.0% | ETH: 50.0%",
+            height=400
+        )
+    
+    @staticmethod
+    def _profile_figure(symbol: str, color: str) -> go.Figure:
+        """
+            _profile_figure() - пустой график Volume Profile для symbol (трасса нужна и без данных - ее обновляют патчи)
+        """
+        # горизонтальная гистограмма
+        fig = go.Figure(data=[
+            go.Bar(
+                y=[],
+                x=[],
+                orientation='h',  # Горизонтальная ориентация
+                marker_color=color,
+                name=f'{symbol} Volume'
+            )
+        ])
+        
+        # Настраиваем внешний вид графика
+        fig.update_layout(
+            title=f"{symbol} Volume Profile (0 сделок)",
+            xaxis_title="Volume",
+            yaxis_title="Price Level",
+            height=400
+        )
+        fig.add_annotation(**_annotation(f"Нет данных для {symbol}"))
+        return fig
+    
     def setup_layout(self):
         """
             setup_layout() - настройка макета веб-интерфейса.
@@ -229,12 +692,12 @@ class Dashboard:
             html.Div([
                 html.Div([
                     html.H4("BTC Volume Profile", style={'textAlign': 'center', 'color': '#f7931a', 'marginBottom': 15}),
-                    dcc.Graph(id='btc-chart')
+                    dcc.Graph(id='btc-chart', figure=self._btc_fig)
                 ], className='six columns', style={'padding': '10px'}),
                 
                 html.Div([
                     html.H4("ETH Volume Profile", style={'textAlign': 'center', 'color': '#627eea', 'marginBottom': 15}),
-                    dcc.Graph(id='eth-chart')
+                    dcc.Graph(id='eth-chart', figure=self._eth_fig)
                 ], className='six columns', style={'padding': '10px'}),
             ], className='row', style={'marginBottom': 30}),
             
@@ -242,7 +705,7 @@ class Dashboard:
             html.Div([
                 html.Div([
                     html.H3("Объемы BTC vs ETH", style={'textAlign': 'center', 'color': '#2ecc71', 'marginBottom': 20}),
-                    dcc.Graph(id='dominance-chart')
+                    dcc.Graph(id='dominance-chart', figure=self._dom_fig)
                 ], className='twelve columns'),
             ], className='row', style={'marginBottom': 30}),
             
@@ -256,37 +719,32 @@ class Dashboard:
     
     def setup_callbacks(self):
         """
-            Настройка callback-функций для автообновления интерфейса:
+            Настройка callback-функции для автообновления интерфейса.
+            Один callback update_dashboard на каждый тик снимает снимок данных (self.data.snapshot())
+            и по нему обновляет все элементы:
                 1. update_stats - обновляет статистику BTC и ETH
                 2. update_btc_chart - обновляет график Volume Profile для BTC
                 3. update_eth_chart - обновляет график Volume Profile для ETH
                 4. update_dominance_chart - обновляет график доминации
+
+            Графики целиком приходят в браузер только с макетом (setup_figures), на каждом тике
+            отправляются лишь изменившиеся свойства графиков (dash.Patch)
         """
         
-        @self.app.callback(
-            [Output('btc-stats', 'children'),
-             Output('eth-stats', 'children')],
-            [Input('interval-component', 'n_intervals')]
-        )
-        def update_stats(n):
+        def update_stats(snapshot: MarketSnapshot):
             try:
-                # Получаем последние 50 сделок для каждой валюты
-                btc_trades = data.get_btc_trades(50)
-                eth_trades = data.get_eth_trades(50)
+                # Статистика по последним 50 сделкам для каждой валюты
+                btc, eth = snapshot.btc, snapshot.eth
                 
                 # Формируем статистику для BTC
-                if btc_trades:
-                    btc_price = btc_trades[-1]['price']  # Цена последней сделки
-                    btc_volume = sum(t['volume'] for t in btc_trades)  # Общий объем
-                    btc_text = f"Цена: ${btc_price:,.2f}   Сделок: {len(btc_trades)}   Объем: {btc_volume:.2f}"
+                if btc.count:
+                    btc_text = f"Цена: ${btc.last_price:,.2f}   Сделок: {min(50, btc.count)}   Объем: {btc.volume_50:.2f}"
                 else:
                     btc_text = "Нет данных"
                 
                 # Формируем статистику для ETH
-                if eth_trades:
-                    eth_price = eth_trades[-1]['price']  # Цена последней сделки
-                    eth_volume = sum(t['volume'] for t in eth_trades)  # Общий объем
-                    eth_text = f"Цена: ${eth_price:,.2f}   Сделок: {len(eth_trades)}   Объем: {eth_volume:.2f}"
+                if eth.count:
+                    eth_text = f"Цена: ${eth.last_price:,.2f}   Сделок: {min(50, eth.count)}   Объем: {eth.volume_50:.2f}"
                 else:
                     eth_text = "Нет данных"
                 
@@ -294,244 +752,158 @@ class Dashboard:
             except Exception as e:
                 return f"Ошибка: {str(e)}", f"Ошибка: {str(e)}"
         
-        @self.app.callback(
-            Output('btc-chart', 'figure'),
-            [Input('interval-component', 'n_intervals')]
-        )
-        def update_btc_chart(n):
+        def update_btc_chart(snapshot: MarketSnapshot):
             try:
-                # Получаем последние 200 сделок BTC
-                trades = data.get_btc_trades(200)
-                
-                if not trades:
-                    return go.Figure().add_annotation(
-                        text="Нет данных для BTC",
-                        xref="paper", yref="paper",
-                        x=0.5, y=0.5, showarrow=False
-                    )
-                
-                # Извлекаем цены и объемы из сделок
-                prices = [t['price'] for t in trades]
-                volumes = [t['volume'] for t in trades]
-                
-                # Создаем ценовые уровни (bins) для группировки
-                min_price = min(prices)
-                max_price = max(prices)
-                price_range = max_price - min_price
-                bins = 20  # Количество ценовых уровней
-                bin_size = price_range / bins if price_range > 0 else 1
-                
-                # Группируем объемы по ценовым уровням
-                volume_by_price = {}
-                for price, volume in zip(prices, volumes):
-                    bin_idx = int((price - min_price) / bin_size)
-                    price_level = min_price + bin_idx * bin_size + bin_size / 2
-                    
-                    if price_level not in volume_by_price:
-                        volume_by_price[price_level] = 0
-                    volume_by_price[price_level] += volume
-                
-                # Сортируем по ценам для корректного отображения
-                sorted_prices = sorted(volume_by_price.keys())
-                sorted_volumes = [volume_by_price[p] for p in sorted_prices]
-                
-                # Создаем горизонтальную гистограмму
-                fig = go.Figure(data=[
-                    go.Bar(
-                        y=sorted_prices,
-                        x=sorted_volumes,
-                        orientation='h',  # Горизонтальная ориентация
-                        marker_color='rgba(247, 147, 26, 0.7)',  # Оранжевый цвет BTC
-                        name='BTC Volume'
-                    )
-                ])
-                
-                # Настраиваем внешний вид графика
-                fig.update_layout(
-                    title=f"BTC Volume Profile ({len(trades)} сделок)",
-                    xaxis_title="Volume",
-                    yaxis_title="Price Level",
-                    height=400
-                )
-                
-                return fig
+                # только изменившиеся свойства графика
+                count = snapshot.btc.profile_count
+                patch = Patch()
+                patch['data'][0]['x'] = snapshot.btc.profile_volumes
+                patch['data'][0]['y'] = snapshot.btc.profile_levels
+                patch['layout']['title']['text'] = f"BTC Volume Profile ({count} сделок)"
+                patch['layout']['annotations'] = [] if count else [_annotation("Нет данных для BTC")]
+                return patch
                 
             except Exception as e:
-                return go.Figure().add_annotation(
-                    text=f"Ошибка BTC: {str(e)}",
-                    xref="paper", yref="paper",
-                    x=0.5, y=0.5, showarrow=False
-                )
+                patch = Patch()
+                patch['layout']['annotations'] = [_annotation(f"Ошибка BTC: {str(e)}")]
+                return patch
         
-        @self.app.callback(
-            Output('eth-chart', 'figure'),
-            [Input('interval-component', 'n_intervals')]
-        )
-        def update_eth_chart(n):
+        def update_eth_chart(snapshot: MarketSnapshot):
             try:
-                # Получаем последние 200 сделок ETH
-                trades = data.get_eth_trades(200)
-                
-                if not trades:
-                    return go.Figure().add_annotation(
-                        text="Нет данных для ETH",
-                        xref="paper", yref="paper",
-                        x=0.5, y=0.5, showarrow=False
-                    )
-                
-                # Извлекаем цены и объемы из сделок
-                prices = [t['price'] for t in trades]
-                volumes = [t['volume'] for t in trades]
-                
-                # Создаем ценовые уровни (bins) для группировки
-                min_price = min(prices)
-                max_price = max(prices)
-                price_range = max_price - min_price
-                bins = 20  # Количество ценовых уровней
-                bin_size = price_range / bins if price_range > 0 else 1
-                
-                # Группируем объемы по ценовым уровням
-                volume_by_price = {}
-                for price, volume in zip(prices, volumes):
-                    bin_idx = int((price - min_price) / bin_size)
-                    price_level = min_price + bin_idx * bin_size + bin_size / 2
-                    
-                    if price_level not in volume_by_price:
-                        volume_by_price[price_level] = 0
-                    volume_by_price[price_level] += volume
-                
-                # Сортируем по ценам для корректного отображения
-                sorted_prices = sorted(volume_by_price.keys())
-                sorted_volumes = [volume_by_price[p] for p in sorted_prices]
+                # только изменившиеся свойства графика
+                count = snapshot.eth.profile_count
+                patch = Patch()
+                patch['data'][0]['x'] = snapshot.eth.profile_volumes
+                patch['data'][0]['y'] = snapshot.eth.profile_levels
+                patch['layout']['title']['text'] = f"ETH Volume Profile ({count} сделок)"
+                patch['layout']['annotations'] = [] if count else [_annotation("Нет данных для ETH")]
+                return patch
                 
-                # Создаем горизонтальную гистограмму
-                fig = go.Figure(data=[
-                    go.Bar(
-                        y=sorted_prices,
-                        x=sorted_volumes,
-                        orientation='h',  # Горизонтальная ориентация
-                        marker_color='rgba(98, 126, 234, 0.7)',  # Синий цвет ETH
-                        name='ETH Volume'
-                    )
-                ])
-                
-                # Настраиваем внешний вид графика
-                fig.update_layout(
-                    title=f"ETH Volume Profile ({len(trades)} сделок)",
-                    xaxis_title="Volume",
-                    yaxis_title="Price Level",
-                    height=400
-                )
-                
-                return fig
+            except Exception as e:
+                patch = Patch()
+                patch['layout']['annotations'] = [_annotation(f"Ошибка ETH: {str(e)}")]
+                return patch
+        
+        def dominance(snapshot: MarketSnapshot):
+            """
+                Проценты доминации BTC и ETH по объемам последних 100 сделок
+            """
+            btc_volume = snapshot.btc.volume_100
+            eth_volume = snapshot.eth.volume_100
+            total_volume = btc_volume + eth_volume
+            
+            if total_volume == 0:
+                # Если нет данных, показываем равное распределение
+                return 50, 50
+            return (btc_volume / total_volume) * 100, (eth_volume / total_volume) * 100
+        
+        def update_dominance_chart(snapshot: MarketSnapshot):
+            try:
+                # только значения и заголовок
+                btc_pct, eth_pct = dominance(snapshot)
+                patch = Patch()
+                patch['data'][0]['values'] = [btc_pct, eth_pct]
+                patch['layout']['title']['text'] = f"Доминация BTC vs ETH<br>BTC: {btc_pct:.1f}% | ETH: {eth_pct:.1f}%"
+                patch['layout']['annotations'] = []
+                return patch
                 
             except Exception as e:
-                return go.Figure().add_annotation(
-                    text=f"Ошибка ETH: {str(e)}",
-                    xref="paper", yref="paper",
-                    x=0.5, y=0.5, showarrow=False
-                )
+                patch = Patch()
+                patch['layout']['annotations'] = [_annotation(f"Ошибка доминации: {str(e)}")]
+                return patch
         
         @self.app.callback(
+            Output('btc-stats', 'children'),
+            Output('eth-stats', 'children'),
+            Output('btc-chart', 'figure'),
+            Output('eth-chart', 'figure'),
             Output('dominance-chart', 'figure'),
-            [Input('interval-component', 'n_intervals')]
+            Input('interval-component', 'n_intervals')
         )
-        def update_dominance_chart(n):
-            try:
-                # Получаем последние 100 сделок для каждой валюты
-                btc_trades = data.get_btc_trades(100)
-                eth_trades = data.get_eth_trades(100)
-                
-                # Вычисляем общие объемы торгов
-                btc_volume = sum(t['volume'] for t in btc_trades)
-                eth_volume = sum(t['volume'] for t in eth_trades)
-                total_volume = btc_volume + eth_volume
-                
-                # Вычисляем проценты доминации
-                if total_volume == 0:
-                    # Если нет данных, показываем равное распределение
-                    btc_pct = 50
-                    eth_pct = 50
-                else:
-                    btc_pct = (btc_volume / total_volume) * 100
-                    eth_pct = (eth_volume / total_volume) * 100
-                
-                # Создаем круговую диаграмму
-                fig = go.Figure(data=[
-                    go.Pie(
-                        labels=['BTC', 'ETH'],
-                        values=[btc_pct, eth_pct],
-                        hole=0.3,  # Дырка в центре для современного вида
-                        marker_colors=['#f7931a', '#627eea']  # Цвета BTC и ETH
-                    )
-                ])
-                
-                # Настраиваем внешний вид графика
-                fig.update_layout(
-                    title=f"Доминация BTC vs ETH<br>BTC: {btc_pct:.1f}% | ETH: {eth_pct:.1f}%",
-                    height=400
-                )
-                
-                return fig
-                
-            except Exception as e:
-                return go.Figure().add_annotation(
-                    text=f"Ошибка доминации: {str(e)}",
-                    xref="paper", yref="paper",
-                    x=0.5, y=0.5, showarrow=False
-                )
+        def update_dashboard(n):
+            # один снимок данных на все элементы интерфейса
+            snapshot = self.data.snapshot()
+            
+            btc_text, eth_text = update_stats(snapshot)
+            return (
+                btc_text,
+                eth_text,
+                update_btc_chart(snapshot),
+                update_eth_chart(snapshot),
+                update_dominance_chart(snapshot)
+            )
         
     
-    def handle_data(self, msg: dict):
+    def handle_data(self, messages: List[OKXMessage], raw_frames: Optional[List[bytes]] = None):
         """
-            Обрабатывает входящие данные от WebSocket API OKX.
+            Обрабатывает пачку входящих сообщений от WebSocket API OKX.
  
             Args:
-                msg (dict): Сообщение от OKX WebSocket API
+                messages (List[OKXMessage]): Сообщения от OKX WebSocket API
+                raw_frames (List[bytes]):    Исходные json-кадры этих сообщений (если клиент их передает)
         """
         try:
-            # Сохраняем сырые данные в файлы для архивирования
-            self.data_manager.save_raw_data(msg)
+            # Передаем сырые данные в очередь фонового потока записи DataManager
+            # (архивирование не блокирует прием)
+            self._save_raw_batch(messages, raw_frames)
             
-            # Обрабатываем только сообщения с данными о сделках
-            if 'data' in msg and msg['data']:
-                arg = msg.get('arg', {})
+            # Собираем цены, объемы и время сделок по инструментам
+            # (методы связаны с локальными именами: в цикле по сделкам
+            # это избавляет от поиска атрибутов на каждой итерации)
+            symbol_id = self.data.symbol_id
+            trades_by_symbol = {}
+            for msg in messages:
+                arg = msg.arg or {}
                 inst_id = arg.get('instId', '')
                 channel = arg.get('channel', '')
                 
-                # Проверяем, что это канал сделок (trades)
-                if channel == 'trades':
-                    for trade in msg['data']:
-                        # Проверяем наличие обязательных полей в сделке
-                        required_fields = ['px', 'sz', 'ts', 'side']  # цена, размер, время, сторона
-                        missing_fields = [field for field in required_fields if field not in trade]
-                        
-                        # Пропускаем сделки с неполными данными
-                        if missing_fields:
-                            continue
-                        
-                        try:
-                            # Формируем структурированные данные о сделке
-                            trade_data = {
-                                'timestamp': int(trade['ts']),      # Время сделки (Unix timestamp)
-                                'price': float(trade['px']),        # Цена сделки
-                                'volume': float(trade['sz']),       # Объем сделки
-                                'side': trade['side'],              # Сторона (buy/sell)
-                                'trade_id': trade.get('tradeId', ''), # ID сделки
-                                'inst_id': trade.get('instId', inst_id) # Инструмент
-                            }
-                            
-                            # Добавляем сделку в глобальный буфер данных
-                            data.add_trade(inst_id, trade_data)
-                            
-                        except Exception as e:
-                            # Игнорируем ошибки обработки отдельных сделок
-                            pass
+                # Обрабатываем только сообщения с данными о сделках (канал trades)
+                # (наличие и типы обязательных полей px, sz, ts, side проверяет декодер OKXMessage)
+                if channel != 'trades' or not msg.data:
+                    continue
+                
+                # Инструменты, которые не отслеживаются буфером, пропускаем без разбора сделок
+                sym_id = symbol_id(inst_id)
+                if sym_id < 0:
+                    continue
+                
+                prices, volumes, timestamps = trades_by_symbol.setdefault(sym_id, ([], [], []))
+                add_price = prices.append
+                add_volume = volumes.append
+                add_ts = timestamps.append
+                for trade in msg.data:
+                    add_price(trade.px)     # Цена сделки
+                    add_volume(trade.sz)    # Объем сделки
+                    add_ts(trade.ts)        # Время сделки (Unix timestamp)
+            
+            # Добавляем сделки в общий буфер данных одной пачкой на инструмент
+            for sym_id, (prices, volumes, timestamps) in trades_by_symbol.items():
+                self.data.add_trades_batch_by_id(
+                    sym_id,
+                    np.array(prices, dtype=np.float64),
+                    np.array(volumes, dtype=np.float64),
+                    np.array(timestamps, dtype=np.int64)
+                )
                             
         except Exception as e:
             # Игнорируем ошибки обработки сообщений
             pass
     
+    def _save_raw_batch(self, messages: List[OKXMessage], raw_frames: Optional[List[bytes]] = None):
+        """
+            Ставит пачку сообщений в очередь на запись в файлы сырых данных.
+            Исходные кадры записываются как есть, без повторной сериализации сообщений
+        """
+        if raw_frames is None:
+            self.data_manager.save_batch([msgspec.to_builtins(msg) for msg in messages])
+            return
+        
+        frames = []
+        for msg, raw in zip(messages, raw_frames):
+            arg = msg.arg or {}
+            frames.append((arg.get('channel', 'unknown'), arg.get('instId', 'unknown'), raw))
+        self.data_manager.save_raw_bytes_batch(frames)
+    
     def start_collector(self):
         """
             Запускает сборщик данных в отдельном потоке для подключения к OKX websocket API и сбора данных
@@ -549,7 +921,11 @@ class Dashboard:
                 try:
                     # создаем клиент WebSocket для OKX API
                     self.client = OKXWebSocketClient(
-                        data_handler=self.handle_data
+                        data_handler_batch=self.handle_data,
+                        pass_raw=True,
+                        # кадры других каналов (books, candle) схема сделок не разбирает -
+                        # архивируем их как есть, канал и инструмент определяет DataManager
+                        undecoded_handler=self.data_manager.save_raw_frames
                     )
                     
                     # каналы для подписки
@@ -573,9 +949,15 @@ class Dashboard:
                             print("🔌 WebSocket соединение закрыто")
                         except:
                             pass
+                    
+                    # дописываем остаток очереди записи и закрываем файлы
+                    self.data_manager.close()
             
-            # запускаем асинхронную функцию в новом event loop
-            asyncio.run(collect_data())
+            # запускаем асинхронную функцию в новом event loop (uvloop, если установлен)
+            if uvloop is not None:
+                uvloop.run(collect_data())
+            else:
+                asyncio.run(collect_data())
         
         # отдельный поток
         self.collector_thread = threading.Thread(target=run_collector, daemon=True)
@@ -597,6 +979,9 @@ class Dashboard:
                 print("Поток сборщика не завершился в течение 5 секунд")
             else:
                 print("Сборщик данных остановлен")
+        
+        # сбрасываем и закрываем файлы сырых данных
+        self.data_manager.close()
     
     def run(self, host='127.0.0.1', port=8050, debug=False):
         print(f"Запуск рабочего дашборда на http://{host}:{port}")
@@ -606,7 +991,9 @@ class Dashboard:
         print("Ожидание накопления данных (5 секунд)...")
         time.sleep(5)
         
-        self.app.run(host=host, port=port, debug=debug)
+        # threaded - запросы разных вкладок обслуживаются параллельно и не ждут друг друга;
+        # без перезагрузчика: в режиме debug он запускает второй процесс со своим Dashboard и сборщиком
+        self.app.run(host=host, port=port, debug=debug, threaded=True, use_reloader=False)
 
 
 def main():
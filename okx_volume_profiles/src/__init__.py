@@ -0,0 +1 @@
+# Sources package
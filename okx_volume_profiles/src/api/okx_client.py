@@ -5,9 +5,38 @@
 import asyncio
 import datetime
 import json
+import msgspec
 import websockets
+from websockets.asyncio.client import ClientConnection
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, Union
+
+
+class Trade(msgspec.Struct, kw_only=True, omit_defaults=True):
+    """
+        Сделка из канала trades в формате OKX API.
+        Числовые поля приходят строками, декодер (strict=False) сразу разбирает их в числа
+    """
+    instId: str = ''
+    tradeId: str = ''
+    px: float
+    sz: float
+    side: str
+    ts: int
+    count: Optional[str] = None
+    source: Optional[str] = None
+
+
+class OKXMessage(msgspec.Struct, omit_defaults=True):
+    """
+        Сообщение OKX WebSocket API: событие (subscribe/error/...) или данные канала trades
+    """
+    arg: Optional[Dict[str, Any]] = None
+    data: Optional[List[Trade]] = None
+    event: Optional[str] = None
+    code: Optional[str] = None
+    msg: Optional[str] = None
+    connId: Optional[str] = None
 
 
 class OKXWebSocketClient:
@@ -18,17 +47,43 @@ class OKXWebSocketClient:
         подписку на каналы данных и обработку входящих сообщений в реальном времени.
     """
 
-    def __init__(self, data_handler: Callable[[Dict[str, Any]], None]):
+    def __init__(self,
+                 data_handler: Optional[Callable[[OKXMessage], None]] = None,
+                 data_handler_batch: Optional[Union[Callable[[List[OKXMessage]], None],
+                                                    Callable[[List[OKXMessage], List[bytes]], None]]] = None,
+                 batch_size: int = 128,
+                 batch_timeout: float = 0.01,
+                 pass_raw: bool = False,
+                 undecoded_handler: Optional[Callable[[List[bytes]], None]] = None):
         """
-            data_handler: функция-обработчик для обработки полученных данных (в виде сообщений)
+            data_handler:       функция-обработчик для обработки полученных данных (в виде сообщений OKXMessage)
+            data_handler_batch: функция-обработчик для пачки сообщений с данными (вызывается вместо data_handler)
+            batch_size:         максимальное количество сообщений в пачке
+            batch_timeout:      время ожидания (сек) следующего сообщения при наборе пачки
+            pass_raw:           передавать в data_handler_batch и исходные кадры сообщений:
+                                data_handler_batch(messages, raw_frames) (например, для архива без пересериализации)
+            undecoded_handler:  функция-обработчик пачки исходных кадров, которые не разбираются схемой OKXMessage
+                                (данные каналов books, candle и т.д.), например, для их архивирования
         """
+        if data_handler is None and data_handler_batch is None:
+            raise ValueError("data_handler or data_handler_batch is required.")
+
         # public websocket url
         self.url = 'wss://ws.okx.com:8443/ws/v5/public'
         
         self.data_handler = data_handler
+        self.data_handler_batch = data_handler_batch
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.pass_raw = pass_raw
+        self.undecoded_handler = undecoded_handler
+
+        # типизированный декодер сообщений: разбирает json сразу в OKXMessage без промежуточных dict
+        # (strict=False - числа-строки OKX разбираются в float/int на стороне msgspec)
+        self._decoder = msgspec.json.Decoder(OKXMessage, strict=False)
         
         # объект websocket соединения
-        self.websocket: Optional[websockets.WebSocketClientProtocol] = None
+        self.websocket: Optional[ClientConnection] = None
 
 
     async def subscribe(self, channels: List[Dict[str, str]]) -> None:
@@ -75,7 +130,7 @@ class OKXWebSocketClient:
                 1. Устанавливает WebSocket соединение с ping/pong
                 2. Подписывается на указанные каналы
                 3. Входит в цикл прослушивания сообщений
-                4. Обрабатывает каждое входящее сообщение
+                4. Набирает пачку из уже пришедших сообщений (до batch_size) и обрабатывает ее
                 5. Корректно закрывает соединение при завершении
 
             Args:
@@ -84,7 +139,11 @@ class OKXWebSocketClient:
         async with websockets.connect(
             self.url, 
             ping_interval=20,  
-            ping_timeout=60    # таймаут ожидания pong
+            ping_timeout=60,    # таймаут ожидания pong
+            max_size=2**22,     # максимальный размер входящего сообщения
+            compression=None,   # без permessage-deflate: сообщения маленькие, zlib на каждый кадр не окупается
+            max_queue=2**14,    # глубокая очередь входящих кадров сглаживает всплески сделок
+            write_limit=2**20   # буфер записи (подписки, pong)
         ) as ws:
             self.websocket = ws # ссылка на websocket соединение
             print(f'Connected at {datetime.datetime.now().isoformat()}')
@@ -92,30 +151,97 @@ class OKXWebSocketClient:
             await self.subscribe(channels)
 
             # основной цикл прослушивания сообщений
-            async for raw_msg in ws:
+            closed = False
+            while not closed:
+                try:
+                    # читаем кадр как bytes: декодер msgspec разбирает их без промежуточной str
+                    batch = [await ws.recv(decode=False)]
+                except websockets.ConnectionClosedOK:
+                    break
+
+                # добираем в пачку сообщения, которые приходят следом
+                error = None
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(await asyncio.wait_for(ws.recv(decode=False), self.batch_timeout))
+                    except asyncio.TimeoutError:
+                        break
+                    except websockets.ConnectionClosedOK:
+                        closed = True
+                        break
+                    except websockets.ConnectionClosed as e:
+                        # обрыв соединения: уже принятые сообщения обрабатываем, затем пробрасываем ошибку
+                        error = e
+                        break
+
+                await self._handle_batch(batch)
+                if error is not None:
+                    raise error
+
+            # очищаем ссылку на websocket при завершении
+            self.websocket = None
+        print(f'Disconnected at {datetime.datetime.now().isoformat()}')
+
+    async def _handle_batch(self, raw_batch: List[bytes]) -> None:
+        """
+            _handle_batch() декодирует пачку сырых сообщений и передает их обработчикам.
+            События логируются по одному, сообщения с данными передаются в data_handler_batch
+            одним списком (или по одному в data_handler, если пакетный обработчик не задан).
+            С pass_raw вместе с сообщениями передается список их исходных кадров (в том же порядке).
+            Кадры, которые не разбираются схемой OKXMessage (сообщения каналов не trades), передаются
+            в undecoded_handler, если он задан.
+
+            Args:
+                raw_batch: список сырых сообщений от WebSocket API
+        """
+        messages = []
+        raw_frames = []
+        undecoded = []
+        for raw_msg in raw_batch:
+            try:
+                # json парсинг сообщения
+                msg = self._decoder.decode(raw_msg)
+            except msgspec.DecodeError as e:
+                if self.undecoded_handler is not None:
+                    undecoded.append(raw_msg)
+                else:
+                    print(f"JSON decode error: {e}")
+                continue
+
+            if self.data_handler_batch is None or msg.event:
                 try:
-                    # json парсинг сообщения
-                    msg = json.loads(raw_msg)
                     # обрабатываем сообщение
                     await self._handle_message(msg)
-                except json.JSONDecodeError as e:
-                    print(f"JSON decode error: {e}")
                 except Exception as e:
                     print(f"Error handling message: {e}")
+            elif msg.data:
+                messages.append(msg)
+                raw_frames.append(raw_msg)
 
-            # очищаем ссылку на websocket при завершении
-            self.websocket = None
-        print(f'Disconnected at {datetime.datetime.now().isoformat()}')
+        if messages:
+            try:
+                if self.pass_raw:
+                    self.data_handler_batch(messages, raw_frames)
+                else:
+                    self.data_handler_batch(messages)
+            except Exception as e:
+                print(f"Error handling messages: {e}")
+
+        if undecoded:
+            try:
+                self.undecoded_handler(undecoded)
+            except Exception as e:
+                print(f"Error handling undecoded messages: {e}")
 
-    async def _handle_message(self, msg: Dict[str, Any]) -> None:
+    async def _handle_message(self, msg: OKXMessage) -> None:
         """
             handle_message() обрабатывает входящее сообщение от WebSocket.
             
             Args:
-                msg: Словарь с данными сообщения от WebSocket API
+                msg: сообщение от WebSocket API
         """
-        event = msg.get('event') # поле вида: subscribe/unsubscribe/error
-        data = msg.get('data')
+        event = msg.event # поле вида: subscribe/unsubscribe/error
+        data = msg.data
 
         if event:
             # логируем ошибки
@@ -123,7 +249,7 @@ class OKXWebSocketClient:
                 print(f"************* ERROR: {msg} *************")
             else:
             # логируем основные события (subscribe, unsubscribe и т.д.)
-                print(f"************* Event: {event} | Arg: {msg.get('arg')} *************")
+                print(f"************* Event: {event} | Arg: {msg.arg} *************")
             return
 
         if data and len(data) > 0:
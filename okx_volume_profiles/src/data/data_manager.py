@@ -2,63 +2,696 @@
 Менеджер данных для сохранения и обработки WebSocket сырых данных.
 """
 
+import atexit
 import json
+import mmap
 import os
-from datetime import datetime
+import queue
+import re
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import msgspec
+
+# сериализатор _encode(msg) -> bytes (компактный json в utf-8) и строки jsonl _dumps(msg) -> bytes
+# (тот же json с переводом строки в конце) выбираются один раз при импорте:
+# orjson (сразу байты utf-8), затем ujson, затем стандартный json
+try:
+    import orjson
+
+    def _encode(msg: dict) -> bytes:
+        return orjson.dumps(msg)
+
+    def _dumps(msg: dict) -> bytes:
+        return orjson.dumps(msg, option=orjson.OPT_APPEND_NEWLINE)
+
+    _loads = orjson.loads
+except ImportError:
+    try:
+        import ujson
+
+        def _encode(msg: dict) -> bytes:
+            return ujson.dumps(msg, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+
+        def _dumps(msg: dict) -> bytes:
+            return (ujson.dumps(msg, ensure_ascii=False, escape_forward_slashes=False) + '\n').encode('utf-8')
+
+        _loads = ujson.loads
+    except ImportError:
+        def _encode(msg: dict) -> bytes:
+            return json.dumps(msg, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+        def _dumps(msg: dict) -> bytes:
+            return (json.dumps(msg, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+        _loads = json.loads
+
+
+# zstandard (необязательный) - сжатие файлов архива (DataManager(compression="zstd"))
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# пустой arg для сообщений без него (только для чтения - чтобы не создавать dict на каждое сообщение)
+_EMPTY: dict = {}
+
+# заголовок кадра формата frames: длина json-сообщения, 4 байта little-endian
+_FRAME_HEADER = struct.Struct('<I')
+
+
+def _frame(msg: dict) -> bytes:
+    """
+        _frame(msg) - сообщение в виде кадра формата frames: заголовок с длиной + json
+    """
+    payload = _encode(msg)
+    return _FRAME_HEADER.pack(len(payload)) + payload
+
+
+def _raw_line(raw: bytes) -> bytes:
+    """
+        _raw_line(raw) - исходный json-кадр как строка jsonl. Переводы строк вне строковых
+        значений json - пробельные символы (внутри строк они экранируются), их можно удалить
+    """
+    if b'\n' in raw:
+        raw = raw.replace(b'\n', b'')
+    return raw + b'\n'
+
+
+def _raw_frame(raw: bytes) -> bytes:
+    """
+        _raw_frame(raw) - исходный json-кадр как кадр формата frames
+    """
+    return _FRAME_HEADER.pack(len(raw)) + raw
+
+
+class _RouteArg(msgspec.Struct):
+    """
+        arg сообщения: только поля, нужные для выбора файла
+    """
+    channel: str = 'unknown'
+    instId: str = 'unknown'
+
+
+class _Route(msgspec.Struct):
+    """
+        Сообщение, из которого разбирается только arg: остальные поля (data и т.д.)
+        декодер пропускает, не создавая для них объектов
+    """
+    arg: Optional[_RouteArg] = None
+
+
+_route_decoder = msgspec.json.Decoder(_Route)
+_NO_ROUTE = _RouteArg()
+
+
+def read_frames(path) -> Iterator[dict]:
+    """
+        read_frames(path) - чтение сообщений из файла формата frames (DataManager(file_format="frames")).
+        Файл отображается в память (mmap), сообщения разбираются по одному кадру; сжатый файл
+        (.frames.zst) сначала распаковывается в память целиком.
+        Незаконченный последний кадр (запись была прервана) пропускается
+    """
+    with open(path, 'rb') as f:
+        if str(path).endswith('.zst'):
+            if zstandard is None:
+                raise ImportError("zstandard is required to read .zst files")
+            with zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True) as reader:
+                yield from _iter_frames(reader.read())
+            return
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from _iter_frames(mm)
+
+
+def _iter_frames(buf) -> Iterator[dict]:
+    """
+        _iter_frames(buf) - разбор кадров формата frames из буфера (bytes или mmap).
+        Кадры, содержимое которых не разбирается как json, пропускаются
+    """
+    header_size = _FRAME_HEADER.size
+    unpack_from = _FRAME_HEADER.unpack_from
+    end = len(buf)
+    pos = 0
+    while pos + header_size <= end:
+        (length,) = unpack_from(buf, pos)
+        start = pos + header_size
+        pos = start + length
+        if pos > end:
+            return
+        try:
+            msg = _loads(buf[start:pos])
+        except ValueError:
+            continue
+        yield msg
+
+
+# флаги открытия файла архива: только дозапись, без наследования дочерними процессами
+# (O_CLOEXEC нет в Windows, O_BINARY есть только там)
+_OPEN_FLAGS = (os.O_WRONLY | os.O_CREAT | os.O_APPEND
+               | getattr(os, 'O_CLOEXEC', 0) | getattr(os, 'O_BINARY', 0))
+
+# мягкий предел размера одного куска буфера файла архива
+_CHUNK_SIZE = 128 * 1024
+
+# максимальное количество буферов в одном вызове writev
+# (sysconf возвращает -1, если фиксированного предела нет)
+try:
+    _IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+
+
+def _write_all(fd: int, buffers: List[bytearray]):
+    """
+        _write_all(fd, buffers) - запись списка буферов в файл: одним вызовом os.writev на каждые
+        _IOV_MAX буферов (scatter-gather, без склейки строк в памяти). Без writev (Windows) -
+        склейка и os.write
+    """
+    if not hasattr(os, 'writev'):
+        data = memoryview(b''.join(buffers))
+        while data:
+            data = data[os.write(fd, data):]
+        return
+
+    for i in range(0, len(buffers), _IOV_MAX):
+        chunk = buffers[i:i + _IOV_MAX]
+        written = os.writev(fd, chunk)
+        total = sum(map(len, chunk))
+        if written < total:
+            # частичная запись - дописываем остаток
+            rest = memoryview(b''.join(chunk))[written:]
+            while rest:
+                rest = rest[os.write(fd, rest):]
+
+
+class _ArchiveFile:
+    """
+        _ArchiveFile - файл архива, открытый на дозапись (O_APPEND), с буфером из готовых строк.
+        Строки собираются в куски-bytearray (не больше _CHUNK_SIZE каждый) и записываются
+        одним writev, когда их объем достигает buffer_size, а также при flush() и close().
+        С компрессором zstd каждый сброс буфера записывается отдельным законченным кадром zstd
+        (файл можно читать, пока в него идет запись)
+    """
+
+    __slots__ = ('path', 'fd', 'buffer_size', 'chunks', 'pending_size', 'compressor', 'dirty')
+
+    def __init__(self, path: str, buffer_size: int, compressor=None):
+        self.path = path
+        self.compressor = compressor
+        # дескриптор файла без файлового объекта Python: буфер - куски chunks
+        self.fd = os.open(path, _OPEN_FLAGS, 0o644)
+        self.buffer_size = buffer_size
+        self.chunks: List[bytearray] = [bytearray()]
+        self.pending_size = 0
+        # в файл записаны данные после последнего fsync
+        self.dirty = False
+
+    def write(self, lines: List[bytes]):
+        """
+            write(lines) - добавление готовых записей (строк jsonl или кадров frames)
+        """
+        chunk = self.chunks[-1]
+        size = self.pending_size
+        for line in lines:
+            if len(chunk) >= _CHUNK_SIZE:
+                # кусок заполнен - следующий, чтобы не перевыделять и не копировать большой буфер
+                chunk = bytearray()
+                self.chunks.append(chunk)
+            chunk += line
+            size += len(line)
+        self.pending_size = size
+        if size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending_size:
+            try:
+                if self.compressor is None:
+                    _write_all(self.fd, self.chunks)
+                else:
+                    cobj = self.compressor.compressobj(size=self.pending_size)
+                    frame = [cobj.compress(chunk) for chunk in self.chunks]
+                    frame.append(cobj.flush())
+                    _write_all(self.fd, frame)
+            finally:
+                self.dirty = True
+                # первый кусок переиспользуется, остальные освобождаются
+                first = self.chunks[0]
+                first.clear()
+                self.chunks = [first]
+                self.pending_size = 0
+
+    def sync(self):
+        """
+            sync() - запись буфера и fsync: данные файла гарантированно на диске
+            (файл без новых данных с прошлой синхронизации пропускается)
+        """
+        self.flush()
+        if self.dirty:
+            os.fsync(self.fd)
+            self.dirty = False
+
+    def close(self):
+        try:
+            self.sync()
+        finally:
+            os.close(self.fd)
+
+
+class _WriterShard:
+    """
+        _WriterShard - поток записи архива со своей очередью и своими файлами.
+        Каждый файл принадлежит ровно одному потоку, lock нужен только для flush()/close()
+        из других потоков
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+        self.queue = queue.SimpleQueue()
+        # открытые файлы потока: (instId, channel) -> файл; путь файла меняется со сменой даты
+        self.files: Dict[Tuple[str, str], _ArchiveFile] = {}
+        self.lock = threading.Lock()
+        self.thread = None
 
 
 class DataManager:
     """
     Менеджер для сохранения и обработки данных от WebSocket API.
     
-    DataManager структирует полученные данные с API в файлы, сохраняемые по filepath=base_raw_path
+    DataManager структирует полученные данные с API в файлы, сохраняемые по filepath=base_raw_path.
+    Файлы открываются один раз на пару (канал, инструмент) с буфером записи WRITE_BUFFER_SIZE
+    и остаются открытыми до close(); данные попадают на диск при заполнении буфера, flush() и close()
+
+    Сериализация и запись выполняются в WRITER_COUNT фоновых потоках: save_raw_data() и save_batch()
+    только ставят сообщения в очередь потока, которому принадлежит пара (instId, channel),
+    поток забирает из своей очереди до WRITE_BATCH_SIZE сообщений за раз.
+    Для каждой пары (instId, channel) при первом сообщении регистрируется (register())
+    функция записи с заранее вычисленными папкой, префиксом имени файла и потоком записи
+
+    Форматы файлов (FILE_FORMATS):
+        - jsonl - по сообщению json на строку (по умолчанию)
+        - frames - кадры "длина (4 байта little-endian) + json", читаются функцией read_frames()
+
+    save_raw_bytes() и save_raw_bytes_batch() принимают исходные json-кадры WebSocket (bytes)
+    и записывают их как есть, без разбора и повторной сериализации; save_raw_frames() сам
+    определяет канал и инструмент кадра, разбирая из него только arg
+
+    С compression="zstd" (нужен пакет zstandard) файлы сжимаются (расширение .zst):
+    каждый сброс буфера файла - отдельный кадр zstd уровня ZSTD_LEVEL
+
+    Надежность: раз в sync_interval секунд фоновый поток записывает буферы открытых файлов
+    и вызывает fsync (так же - flush() и закрытие файла). При аварийном завершении процесса
+    теряются только сообщения последних sync_interval секунд (и еще не записанные из очереди);
+    sync_interval=None отключает периодическую синхронизацию
     """
 
-    def __init__(self, base_raw_path: str = "data/raw"):
+    # размер буфера записи одного файла (объем строк, после которого они записываются на диск)
+    WRITE_BUFFER_SIZE = 1 << 20
+    # максимальное количество сообщений, записываемых фоновым потоком за раз
+    WRITE_BATCH_SIZE = 256
+    # количество фоновых потоков записи
+    WRITER_COUNT = min(4, os.cpu_count() or 1)
+
+    # папка по семейству канала OKX (trades-all -> trades, candle1m -> candle, books5 -> books)
+    CHANNEL_DIRS = {"trades": "trades", "candle": "candles", "books": "books"}
+    # семейство канала - начальные латинские буквы имени
+    _CHANNEL_FAMILY = re.compile(r"[a-z]+")
+
+    # формат: (расширение, сериализация dict, запись исходного кадра bytes)
+    FILE_FORMATS = {"jsonl": (".jsonl", _dumps, _raw_line), "frames": (".frames", _frame, _raw_frame)}
+    # уровень сжатия zstd
+    ZSTD_LEVEL = 3
+
+    def __init__(self, base_raw_path: str = "data/raw", file_format: str = "jsonl",
+                 compression: Optional[str] = None, sync_interval: Optional[float] = 1.0):
         """
         Args:
-            base_raw_path (str): базовый путь для сохранения сырых данных
+            base_raw_path (str):    базовый путь для сохранения сырых данных
+            file_format (str):      формат файлов: "jsonl" или "frames"
+            compression (str):      сжатие файлов: None или "zstd"
+            sync_interval (float):  период (сек) записи буферов и fsync; None - только при flush()/close()
         """
+        if file_format not in self.FILE_FORMATS:
+            raise ValueError(f"Unknown file format: {file_format}")
+        if compression not in (None, "zstd"):
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstandard is required for compression='zstd'")
         self.base_raw_path = Path(base_raw_path)
+        self.file_format = file_format
+        self.compression = compression
+        self._suffix, self._serialize, self._serialize_raw = self.FILE_FORMATS[file_format]
+        if compression == "zstd":
+            self._suffix += ".zst"
+        
+        # каталоги, которые уже созданы (повторный mkdir не нужен)
+        self._known_dirs = set()
         self._ensure_directories()
+        
+        # папки каналов: семейство канала -> папка, прочие каналы - в other
+        # (пути - строки: os.open и os.makedirs принимают их без преобразования Path)
+        base = str(self.base_raw_path)
+        self._channel_dirs = {family: os.path.join(base, folder) for family, folder in self.CHANNEL_DIRS.items()}
+        self._other_dir = os.path.join(base, "other")
+        
+        # текущая дата для имен файлов и момент ее смены (Unix time следующей полуночи)
+        self._date_str = ''
+        self._date_boundary = 0.0
+        
+        # фоновые потоки записи
+        self._shards = [_WriterShard(i) for i in range(self.WRITER_COUNT)]
+        # _running и отправка завершающего None в очереди меняются под _state_lock: сообщение,
+        # поставленное в очередь, всегда оказывается перед None и будет записано
+        self._state_lock = threading.Lock()
+        self._running = True
+        for shard in self._shards:
+            shard.thread = threading.Thread(target=self._writer_loop, args=(shard,),
+                                            name=f"raw-data-writer-{shard.index}", daemon=True)
+            shard.thread.start()
+        
+        # фоновый поток периодической синхронизации файлов с диском
+        self.sync_interval = sync_interval
+        self._stop_sync = threading.Event()
+        self._sync_thread = None
+        if sync_interval:
+            self._sync_thread = threading.Thread(target=self._sync_loop, name="raw-data-sync", daemon=True)
+            self._sync_thread.start()
+        
+        # зарегистрированные пары: (instId, channel) -> (поток записи, функция записи строк)
+        self._writers: Dict[Tuple[str, str], Tuple[_WriterShard, Callable[[List[bytes], str], None]]] = {}
+        
+        # очереди дописываются, а буферы файлов сбрасываются и при завершении процесса
+        atexit.register(self.close)
 
     def _ensure_directories(self):
         """
             _ensure_directories() оздает необходимые директории для хранения данных. Например:
                 - trades - для данных о сделках
                 - candles - для данных свечей
+                - books - для данных стакана
         """
-        channels = ["trades", "candles", "other"]
+        channels = ["trades", "candles", "books", "other"]
         for channel in channels:
-            (self.base_raw_path / channel).mkdir(parents=True, exist_ok=True)
+            folder = os.path.join(str(self.base_raw_path), channel)
+            os.makedirs(folder, exist_ok=True)
+            self._known_dirs.add(folder)
+
+    def _today(self) -> str:
+        """
+        _today() возвращает текущую дату в виде YYYY-MM-DD. strftime вызывается только
+        при смене даты, тогда же закрываются файлы за прошедший день
+        """
+        now = time.time()
+        if now >= self._date_boundary:
+            today = datetime.fromtimestamp(now)
+            midnight = today.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            self._date_str = today.strftime("%Y-%m-%d")
+            self._date_boundary = midnight.timestamp()
+            self._close_files()
+        return self._date_str
+
+    def _get_folder(self, channel: str) -> str:
+        """
+        _get_folder(channel) возвращает папку для канала по его семейству
+        """
+        family = self._CHANNEL_FAMILY.match(channel)
+        return self._channel_dirs.get(family.group() if family else '', self._other_dir)
+
+    def register(self, inst_id: str, channel: str) -> Tuple[_WriterShard, Callable[[List[bytes], str], None]]:
+        """
+        register(inst_id, channel) регистрирует пару (instId, channel): выбирает поток записи,
+        папку и префикс имени файла и создает функцию записи строк в файл этой пары.
+        Повторная регистрация возвращает уже созданную функцию
+        
+        Формат файлов: {instId}_{channel}_{YYYY-MM-DD}.jsonl (или .frames, со сжатием - .zst)
+        
+        Returns:
+            (поток записи, функция записи строк write(lines, date_str)) - функция вызывается
+            потоком записи под его lock
+        """
+        key = (inst_id, channel)
+        registered = self._writers.get(key)
+        if registered is not None:
+            return registered
+
+        shard = self._shards[hash(key) % len(self._shards)]
+        folder = self._get_folder(channel)
+        if folder not in self._known_dirs:
+            os.makedirs(folder, exist_ok=True)
+            self._known_dirs.add(folder)
+        # путь файла без даты и расширения
+        prefix = os.path.join(folder, f"{inst_id}_{channel}_")
+        suffix = self._suffix
+        # компрессор у каждого файла свой: файлы разных потоков записи сжимаются параллельно
+        compressor = zstandard.ZstdCompressor(level=self.ZSTD_LEVEL) if self.compression else None
+
+        files = shard.files
+        buffer_size = self.WRITE_BUFFER_SIZE
+        file_date = None
+
+        def write(lines: List[bytes], date_str: str):
+            # файл открывается при первой записи и заново - только при смене даты
+            nonlocal file_date
+            f = files.get(key)
+            if f is None or file_date != date_str:
+                if f is not None:
+                    # наступил новый день - файл за прошлую дату закрываем
+                    f.close()
+                f = files[key] = _ArchiveFile(f"{prefix}{date_str}{suffix}", buffer_size, compressor)
+                file_date = date_str
+            f.write(lines)
+
+        registered = self._writers[key] = (shard, write)
+        return registered
 
     def save_raw_data(self, msg: dict):
         """
-        save_raw_data(msg) сохраняет сырые данные в соответствующую папку
+        save_raw_data(msg) ставит сырые данные в очередь на сохранение в соответствующую папку
         
         Формат файлов: {instId}_{channel}_{YYYY-MM-DD}.jsonl
         
         Args:
             msg (dict): Сообщение от WebSocket API OKX
         """
+        self.save_batch([msg])
+
+    def save_batch(self, msgs: list):
+        """
+        save_batch(msgs) раскладывает пачку сообщений по очередям фоновых потоков записи
+        (после close() пачка записывается сразу в вызывающем потоке)
+        
+        Args:
+            msgs (list): Сообщения от WebSocket API OKX
+        """
+        by_key = {}
+        by_key_get = by_key.get
+        for msg in msgs:
+            arg = msg.get('arg') or _EMPTY
+            key = (arg.get('instId', 'unknown'), arg.get('channel', 'unknown'))
+            key_msgs = by_key_get(key)
+            if key_msgs is None:
+                by_key[key] = [msg]
+            else:
+                key_msgs.append(msg)
+        self._enqueue(by_key, self._serialize)
 
-        arg = msg.get('arg', {})
-        channel = arg.get('channel', 'unknown')  
-        inst_id = arg.get('instId', 'unknown')   
+    def save_raw_bytes(self, channel: str, inst_id: str, raw: bytes):
+        """
+        save_raw_bytes(channel, inst_id, raw) ставит исходный json-кадр сообщения в очередь
+        на запись как есть (без разбора и повторной сериализации)
+        
+        Args:
+            channel (str): канал сообщения (arg.channel)
+            inst_id (str): инструмент сообщения (arg.instId)
+            raw (bytes):   json-кадр сообщения от WebSocket API OKX
+        """
+        self._enqueue({(inst_id, channel): [raw]}, self._serialize_raw)
+
+    def save_raw_bytes_batch(self, frames: List[Tuple[str, str, bytes]]):
+        """
+        save_raw_bytes_batch(frames) - пакетный save_raw_bytes(): раскладывает исходные json-кадры
+        по очередям фоновых потоков записи
+        
+        Args:
+            frames (list): кадры [(channel, inst_id, raw), ...]
+        """
+        by_key = {}
+        by_key_get = by_key.get
+        for channel, inst_id, raw in frames:
+            key = (inst_id, channel)
+            key_raws = by_key_get(key)
+            if key_raws is None:
+                by_key[key] = [raw]
+            else:
+                key_raws.append(raw)
+        self._enqueue(by_key, self._serialize_raw)
+
+    def save_raw_frames(self, raws: List[bytes]):
+        """
+        save_raw_frames(raws) ставит исходные json-кадры в очередь на запись как есть, определяя
+        канал и инструмент каждого кадра по его arg (остальное содержимое кадра не разбирается).
+        Кадры, которые не являются json, не записываются
+        
+        Args:
+            raws (list): json-кадры сообщений от WebSocket API OKX
+        """
+        decode = _route_decoder.decode
+        by_key = {}
+        by_key_get = by_key.get
+        for raw in raws:
+            try:
+                arg = decode(raw).arg or _NO_ROUTE
+            except msgspec.ValidationError:
+                # json, но arg другого вида - в папку other
+                arg = _NO_ROUTE
+            except msgspec.DecodeError:
+                print(f"Кадр не является json, пропущен: {raw[:64]!r}")
+                continue
+            key = (arg.instId, arg.channel)
+            key_raws = by_key_get(key)
+            if key_raws is None:
+                by_key[key] = [raw]
+            else:
+                key_raws.append(raw)
+        self._enqueue(by_key, self._serialize_raw)
+
+    def _enqueue(self, by_key: dict, serialize: Callable[[object], bytes]):
+        """
+        _enqueue(by_key, serialize) ставит сгруппированные по (instId, channel) сообщения в очереди
+        потоков записи вместе с функцией их сериализации (после close() - записывает сразу)
+        """
+        writers = self._writers
+        items = [(key, writers.get(key) or self.register(*key), key_msgs) for key, key_msgs in by_key.items()]
+        with self._state_lock:
+            if self._running:
+                for key, (shard, write), key_msgs in items:
+                    shard.queue.put((write, key_msgs, serialize))
+                return
+        for key, (shard, write), key_msgs in items:
+            self._write_inline(shard, key, [(write, key_msgs, serialize)])
+
+    def _write_inline(self, shard: _WriterShard, key: Tuple[str, str], batch: list):
+        """
+        _write_inline(shard, key, batch) - запись после close() в вызывающем потоке: дожидается,
+        пока поток записи допишет свою очередь (порядок сообщений сохраняется), записывает пачку
+        и сразу сбрасывает файл на диск - фоновой синхронизации после close() уже нет
+        """
+        thread = shard.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._write_batch(shard, batch)
+        with shard.lock:
+            f = shard.files.get(key)
+            if f is not None:
+                f.flush()
+
+    def _writer_loop(self, shard: _WriterShard):
+        """
+        _writer_loop(shard) - цикл фонового потока записи: ждет первую пачку, добирает из очереди
+        все накопившееся (до WRITE_BATCH_SIZE сообщений) и записывает одним проходом.
+        Завершается, получив из очереди None (после записи всего, что было до него)
+        """
+        get, get_nowait = shard.queue.get, shard.queue.get_nowait
+        stop = False
+        while not stop:
+            item = get()
+            if item is None:
+                return
+            batch = [item]
+            count = len(item[1])
+            while count < self.WRITE_BATCH_SIZE:
+                try:
+                    item = get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                count += len(item[1])
+            try:
+                self._write_batch(shard, batch)
+            except Exception as e:
+                print(f"Ошибка записи сырых данных: {e}")
+
+    def _write_batch(self, shard: _WriterShard, batch: list):
+        """
+        _write_batch(shard, batch) сериализует пачку [(функция записи, сообщения, сериализация), ...]
+        и передает строки каждого файла в его буфер (на диск они уходят одним writev на файл
+        при заполнении буфера)
+        """
+        lines_by_writer = {}
+        for write, msgs, serialize in batch:
+            lines = lines_by_writer.get(write)
+            if lines is None:
+                lines = lines_by_writer[write] = []
+            lines.extend(map(serialize, msgs))
+
+        # дата - до захвата lock: при смене даты _today() закрывает файлы всех потоков
+        date_str = self._today()
 
-        if 'trade' in channel:
-            folder = self.base_raw_path / "trades"
-        else:
-            folder = self.base_raw_path / "other"
+        # запись в файлы
+        with shard.lock:
+            for write, lines in lines_by_writer.items():
+                write(lines, date_str)
 
-        folder.mkdir(exist_ok=True)
+    def _sync_loop(self):
+        """
+        _sync_loop() - цикл потока синхронизации: раз в sync_interval секунд вызывает flush()
+        """
+        while not self._stop_sync.wait(self.sync_interval):
+            self.flush()
 
-        # cоздаем имя файла на основе текущей даты
-        timestamp = datetime.now().strftime("%Y-%m-%d")
-        filename = f"{inst_id}_{channel}_{timestamp}.jsonl"
-        filepath = folder / filename
+    def flush(self):
+        """
+        flush() записывает буферы всех открытых файлов и синхронизирует их с диском (fsync)
+        """
+        for shard in self._shards:
+            with shard.lock:
+                for f in shard.files.values():
+                    try:
+                        f.sync()
+                    except OSError as e:
+                        print(f"Ошибка записи файла {f.path}: {e}")
 
-        # сериализация в jsonl
-        with open(filepath, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(msg, ensure_ascii=False) + '\n')
\ No newline at end of file
+    def close(self):
+        """
+        close() дописывает очереди, останавливает потоки записи, сбрасывает на диск
+        и закрывает все открытые файлы (повторный вызов безопасен)
+        """
+        with self._state_lock:
+            if self._running:
+                self._running = False
+                for shard in self._shards:
+                    shard.queue.put(None)
+        self._stop_sync.set()
+        sync_thread, self._sync_thread = self._sync_thread, None
+        if sync_thread is not None and sync_thread.is_alive():
+            sync_thread.join()
+        for shard in self._shards:
+            # ссылка на поток остается: запись после close() ждет его завершения
+            if shard.thread is not None:
+                shard.thread.join()
+        self._close_files()
+
+    def _close_files(self):
+        """
+        _close_files() закрывает все открытые файлы
+        """
+        for shard in self._shards:
+            with shard.lock:
+                for f in shard.files.values():
+                    try:
+                        f.close()
+                    except OSError as e:
+                        print(f"Ошибка закрытия файла {f.path}: {e}")
+                shard.files.clear()
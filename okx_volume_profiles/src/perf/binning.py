@@ -0,0 +1,89 @@
+"""
+Вычислительные ядра для построения volume profile.
+
+Если установлен numba, группировка объемов по ценовым уровням компилируется
+в машинный код (@njit), иначе используется векторизованная реализация на NumPy.
+"""
+
+import math
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _vol_profile_numpy(prices: np.ndarray, volumes: np.ndarray, bins: int, pad: int):
+    """
+        _vol_profile_numpy() - группировка объемов через np.bincount
+    """
+    min_price = prices.min()
+    price_range = prices.max() - min_price
+    bin_size = price_range / bins if price_range > 0 else 1.0
+    min_price -= pad * bin_size
+    total = bins + 2 * pad
+
+    # индекс уровня для каждой сделки; без запаса максимальная цена попадает в последний уровень
+    bin_idx = np.clip(((prices - min_price) / bin_size).astype(np.int64), 0, total - 1)
+    bin_volumes = np.bincount(bin_idx, weights=volumes, minlength=total)
+    return float(min_price), float(bin_size), bin_volumes
+
+
+if njit is not None:
+    # без fastmath: границы сетки и индексы уровней должны совпадать с теми, что TradeRing
+    # вычисляет в Python при инкрементальном обновлении (перестановка операций их сдвигает)
+    @njit(cache=True, boundscheck=False)
+    def _vol_profile_jit(prices, volumes, bins, pad):
+        """
+            _vol_profile_jit() - группировка объемов одним проходом скомпилированного цикла
+        """
+        n = prices.shape[0]
+
+        min_price = prices[0]
+        max_price = prices[0]
+        for i in range(1, n):
+            if prices[i] < min_price:
+                min_price = prices[i]
+            elif prices[i] > max_price:
+                max_price = prices[i]
+
+        price_range = max_price - min_price
+        bin_size = price_range / bins if price_range > 0 else 1.0
+        min_price -= pad * bin_size
+        total = bins + 2 * pad
+
+        bin_volumes = np.zeros(total, dtype=np.float64)
+        for i in range(n):
+            b = int(math.floor((prices[i] - min_price) / bin_size))
+            if b > total - 1:
+                b = total - 1
+            bin_volumes[b] += volumes[i]
+
+        return min_price, bin_size, bin_volumes
+
+
+def vol_profile(prices: np.ndarray, volumes: np.ndarray, bins: int = 20, pad: int = 0):
+    """
+        vol_profile() - группировка объемов сделок по ценовым уровням (bins).
+
+        Args:
+            prices (np.ndarray):    цены сделок (непустой массив)
+            volumes (np.ndarray):   объемы сделок
+            bins (int):             количество ценовых уровней на диапазон цен [min, max]
+            pad (int):              запас сетки - дополнительные пустые уровни того же шага
+                                    ниже min и выше max (всего уровней bins + 2 * pad)
+
+        Returns:
+            (min_price, bin_size, bin_volumes): нижняя граница сетки, шаг уровня и объемы на каждом уровне
+    """
+    if njit is None:
+        return _vol_profile_numpy(prices, volumes, bins, pad)
+
+    min_price, bin_size, bin_volumes = _vol_profile_jit(
+        np.ascontiguousarray(prices, dtype=np.float64),
+        np.ascontiguousarray(volumes, dtype=np.float64),
+        bins,
+        pad
+    )
+    return float(min_price), float(bin_size), bin_volumes